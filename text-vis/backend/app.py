@@ -1,16 +1,16 @@
-import os, json, re
+import os, json, re, string, codecs, asyncio, hashlib, threading
+from pathlib import Path
 from typing import List, Dict
 from fastapi import FastAPI, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 import spacy
-import networkx as nx
-from collections import defaultdict
-from openai import OpenAI
+from collections import Counter, defaultdict
+from itertools import combinations
+from openai import AsyncOpenAI
 
 # ---------------- 初始化 ----------------
 app = FastAPI()
-nlp = spacy.load("en_core_web_sm")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,16 +41,102 @@ HONORIFICS = {"mr", "mrs", "ms", "miss", "dr", "mme", "mlle", "sir", "lady", "lo
 # 用于在prompt中排除的词
 SKIP_WORDS = ["copyright", "edition", "chapter", "preface", "project", "release", "translator", "gutenberg"]
 
-def split_text_by_sentence(text):
-    """按句子拆分"""
-    text = re.sub(r'\s+', ' ', text)
-    doc = nlp(text)
-    return [sent.text.strip() for sent in doc.sents if len(sent.text.strip()) > 20]
-
-def extract_persons(chunk):
-    """提取句子中的人名"""
-    doc = nlp(chunk)
-    return [ent.text.strip() for ent in doc.ents if ent.label_ == "PERSON"]
+# 预编译正则 避免在热路径上重复解析
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+WS_RE = re.compile(r"\s+")
+BRACKETS_RE = re.compile(r"[\[\(\{].*?[\]\)\}]")
+FILLER_RE = re.compile(r"\b(but|said|says|then|also)\b", re.IGNORECASE)
+ILLUSTRATION_RE = re.compile(r"\[.*?illustration.*?\]", re.IGNORECASE | re.DOTALL)
+COPYRIGHT_RE = re.compile(r"\[_copyright.*?\]", re.IGNORECASE | re.DOTALL)
+# SKIP_WORDS的子串匹配合并成一个正则 代替 any(k in name.lower() ...)
+SKIP_RE = re.compile("|".join(map(re.escape, SKIP_WORDS)), re.IGNORECASE)
+# BLACKLIST同理 一次search代替逐个子串判断
+BLACKLIST_RE = re.compile("|".join(map(re.escape, BLACKLIST)), re.IGNORECASE)
+
+# 名字中只保留英文字母 空格和撇号 其余ASCII字符一次性删掉
+NAME_KEEP = set(string.ascii_letters + " '")
+NAME_TRANS = str.maketrans("", "", "".join(c for c in map(chr, range(128)) if c not in NAME_KEEP))
+
+# spaCy模型在第一次分析时才加载 整个进程共用一份
+NLP = None
+NLP_LOCK = threading.Lock()
+
+def get_nlp():
+    """第一次分析时才加载spaCy模型 之后复用 /ping不用等模型加载"""
+    global NLP
+    if NLP is None:
+        # 多个/analyze可能同时在线程里第一次调用 加锁后再检查一次 只加载一份模型
+        with NLP_LOCK:
+            if NLP is None:
+                NLP = load_nlp()
+    return NLP
+
+def load_nlp():
+    """加载spaCy模型并只保留需要的组件"""
+    # USE_GPU=1时NER放到GPU上跑 没有可用GPU时prefer_gpu会退回CPU
+    if os.getenv("USE_GPU") == "1":
+        print("🔹 spaCy using GPU:", spacy.prefer_gpu())
+    # 只需要句子边界和PERSON实体 关掉用不到的组件
+    # 句子切分用规则sentencizer代替依存parser 对长篇小说快很多
+    # 共享的tok2vec只给tagger和parser用 ner有自己的tok2vec 所以一起关掉
+    nlp = spacy.load("en_core_web_sm", disable=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"])
+    nlp.add_pipe("sentencizer", before="ner")
+    return nlp
+
+# 按段落送入nlp.pipe 超长段落再切块 避免单个Doc过大
+MAX_CHUNK_CHARS = 20_000
+# 切块时优先找的句末标记 包括对话里的 ?" 和 !"
+SENTENCE_ENDS = (". ", "? ", "! ", '." ', '?" ', '!" ')
+# nlp.pipe的批大小 可用环境变量调整
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+
+def chunk_text(text, max_chars=MAX_CHUNK_CHARS):
+    """按空行分段 超长段落按长度切块 尽量在句末切开 其次在空格处 不切断单词"""
+    for para in PARAGRAPH_RE.split(text):
+        para = WS_RE.sub(" ", para).strip()
+        start = 0
+        while start < len(para):
+            end = min(start + max_chars, len(para))
+            if end < len(para):
+                # 句末标记后面的空格位置 切在空格前 没找到的标记不算
+                cut = max((i + len(mark) - 1 for mark in SENTENCE_ENDS
+                           if (i := para.rfind(mark, start, end)) >= 0), default=-1)
+                if cut > start:
+                    end = cut
+                else:
+                    # 窗口里没有句末 退到最后一个空格
+                    cut = para.rfind(" ", start, end)
+                    if cut > start:
+                        end = cut
+            yield para[start:end]
+            start = end
+
+def extract_sentences_and_persons(text):
+    """只解析一次全文 同时得到句子和每句中清洗后的人名"""
+    sentences, sent_persons = [], []
+    for doc in get_nlp().pipe(chunk_text(text), batch_size=SPACY_BATCH_SIZE):
+        # sent.ents每句都会重建整个doc.ents 这里只取一次 随句子顺序往后走
+        ents = [ent for ent in doc.ents if ent.label_ == "PERSON"]
+        i = 0
+        for sent in doc.sents:
+            sent_ents = []
+            while i < len(ents) and ents[i].start < sent.end:
+                ent = ents[i]
+                i += 1
+                # 跨句子边界的实体丢掉 与sent.ents一致
+                if ent.start >= sent.start and ent.end <= sent.end:
+                    sent_ents.append(ent)
+            sent_text = sent.text.strip()
+            if len(sent_text) <= 20:
+                continue
+            persons = []
+            for ent in sent_ents:
+                p_clean = clean_name(ent.text)
+                if p_clean:
+                    persons.append(p_clean)
+            sentences.append(sent_text)
+            sent_persons.append(persons)
+    return sentences, sent_persons
 
 
 # 处理名字
@@ -58,33 +144,30 @@ def clean_name(name: str) -> str:
     if not name:
         return ""
 
-    name = re.sub(r"[\r\n]+", " ", name)
-    name = re.sub(r"\s+", " ", name).strip()
-    name = re.sub(r"[\[\(\{].*?[\]\)\}]", "", name)
-    name = re.sub(r"[^A-Za-z\s']", "", name).strip()
+    name = " ".join(name.split())
+    name = BRACKETS_RE.sub("", name)
+    if not name.isascii():
+        name = name.encode("ascii", "ignore").decode("ascii")
 
-    if not name:
-        return ""
+    parts = name.translate(NAME_TRANS).split()
+
+    # 重建名字
+    name_cleaned = " ".join(p.capitalize() for p in parts)
 
-    parts = name.split()
+    # 去掉后缀残留的词 例如 --but said
+    # 之后再做前缀和黑名单检查 保证clean_name(clean_name(x)) == clean_name(x)
+    parts = FILLER_RE.sub("", name_cleaned).split()
     if not parts:
         return ""
+    name_cleaned = " ".join(parts)
 
     # honorific
-    if parts[0].lower().strip(".") in HONORIFICS and len(parts) == 1:
+    if parts[0].lower() in HONORIFICS and len(parts) == 1:
         return ""
 
-    # 重建名字
-    name_cleaned = " ".join(p.capitalize() for p in parts)
-
-    # 去掉后缀残留的词 例如 --but said
-    name_cleaned = re.sub(r"\b(but|said|says|then|also)\b", "", name_cleaned, flags=re.IGNORECASE).strip()
-
     # 黑名单过滤
-    lname = name_cleaned.lower()
-    for bad in BLACKLIST:
-        if bad in lname:
-            return ""
+    if BLACKLIST_RE.search(name_cleaned):
+        return ""
 
     return name_cleaned
 
@@ -98,19 +181,8 @@ def clean_illustrations(text: str) -> str:
     [_Copyright 1894 by ...]
     """
 
-    text = re.sub(
-        r"\[.*?illustration.*?\]",
-        "",
-        text,
-        flags=re.IGNORECASE | re.DOTALL
-    )
-
-    text = re.sub(
-        r"\[_copyright.*?\]",
-        "",
-        text,
-        flags=re.IGNORECASE | re.DOTALL
-    )
+    text = ILLUSTRATION_RE.sub("", text)
+    text = COPYRIGHT_RE.sub("", text)
 
     """text = re.sub(r"\[[^\]]{0,200}\]", " ", text)
     # Normalize whitespace
@@ -120,40 +192,46 @@ def clean_illustrations(text: str) -> str:
     return text
 
 
-# ---------------- 主分析接口 ----------------
-@app.post("/analyze")
-async def analyze(file: UploadFile):
-    text = (await file.read()).decode("utf-8", errors="ignore")
+# 上传文件每次读取的字节数
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+async def read_upload_text(file: UploadFile) -> str:
+    """分块读取上传文件并增量解码 不把整份bytes留在内存里"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+# ---------------- 提取候选人名 ----------------
+def extract_candidates(text):
+    """清洗文本 切句并提取人名 返回句子 每句人名和候选名字列表"""
     # 删掉Gutenberg illustration
     text = clean_illustrations(text)
 
-    skip_words = [
-        "copyright", "edition", "chapter", "preface",
-        "project", "release", "translator", "gutenberg"
-    ]
-    
     print("🔹 Splitting sentences and extracting names...")
-    sentences = split_text_by_sentence(text)
-    all_names, sent_persons = [], []
-    sent_persons = []  
-
-    for sent in sentences:
-        raw_persons = extract_persons(sent)  
-        persons = []
-        for p in raw_persons:
-            p_clean = clean_name(p)
-            if p_clean:
-                persons.append(p_clean)
-        if persons:
-            sent_persons.append(persons)
-            all_names.extend(persons)
-        else:
-            sent_persons.append([])
+    sentences, sent_persons = extract_sentences_and_persons(text)
+    # 取出现次数最多的200个名字 而不是按字母序截断
+    name_counts = Counter(p for persons in sent_persons for p in persons)
+    unique_names = sorted(n for n, _ in name_counts.most_common(200))
+    print(f"Extracted {len(unique_names)} candidate names.")
+    return sentences, sent_persons, unique_names
 
 
-    unique_names = sorted(set(all_names))[:200]
-    print(f"Extracted {len(unique_names)} candidate names.")
+# ---------------- GPT 角色聚合 ----------------
+GPT_MODEL = "gpt-4o-mini"
 
+# 短文本或候选名字太少时直接identity映射 不调用GPT
+SMALL_TEXT_CHARS = 50_000
+MIN_GPT_NAMES = 10
+
+def is_small_input(text, unique_names):
+    return len(unique_names) < MIN_GPT_NAMES or len(text) < SMALL_TEXT_CHARS
+
+def build_gpt_request(unique_names):
+    """构造名字聚合的 responses.create 参数 在线接口和批处理共用"""
     prompt = f"""
 You are an expert in literary text analysis.
 
@@ -183,61 +261,73 @@ Rules:
 - No markdown, no explanations, no comments, no backticks.
 - Keep only names of fictional characters that appear within the story.
 """
+    return {
+        "model": GPT_MODEL,
+        "temperature": 0,
+        "input": [
+            {"role": "system", "content": "Return valid JSON only."},
+            {"role": "user", "content": prompt},
+        ],
+        # JSON模式 输出一定是合法的JSON对象 不会带```代码块
+        "text": {"format": {"type": "json_object"}},
+    }
+
+# GPT聚合结果的磁盘缓存 同一本书重复上传时不再调用GPT
+GPT_CACHE_DIR = Path(os.getenv("GPT_CACHE_DIR", Path(__file__).parent / "gpt_cache"))
+
+def mapping_cache_path(unique_names):
+    """缓存文件名取整个请求的hash 换prompt或模型时自动失效"""
+    request = json.dumps(build_gpt_request(unique_names), ensure_ascii=False, sort_keys=True)
+    key = hashlib.blake2b(request.encode("utf-8"), digest_size=16).hexdigest()
+    return GPT_CACHE_DIR / f"{key}.json"
+
+def load_cached_mapping(unique_names):
+    path = mapping_cache_path(unique_names)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def save_cached_mapping(unique_names, mapping):
+    """缓存只是锦上添花 写失败（只读目录 磁盘满等）只打印 不影响GPT结果"""
+    try:
+        GPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        mapping_cache_path(unique_names).write_text(json.dumps(mapping, ensure_ascii=False), encoding="utf-8")
+    except OSError as e:
+        print("🔸 GPT cache write failed:", e)
+
+async def normalize_names(unique_names):
+    """调用GPT把名字变体聚合到canonical 失败时每个名字映射到自己"""
+    mapping = load_cached_mapping(unique_names)
+    if mapping is not None:
+        print("🔹 GPT mapping loaded from cache.")
+        return mapping
 
-    # ---------------- GPT 角色聚合 ----------------
     try:
         print("🔹 Calling GPT model for name normalization...")
-        resp = client.responses.create(
-            model="gpt-4o-mini",
-            temperature=0,
-            input=[
-                {"role": "system", "content": "Return valid JSON only."},
-                {"role": "user", "content": prompt},
-            ],
-        )
-
-        mapping_text = ""
-        if hasattr(resp, "output_text") and resp.output_text:
-            mapping_text = resp.output_text.strip()
-        else:
-            # Fallback: try to extract from resp.output or resp.get("output", ...)
-            try:
-                # resp.output is often a list of dicts with 'content' items
-                if isinstance(resp.output, list):
-                    parts = []
-                    for item in resp.output:
-                        # try a few likely keys
-                        if isinstance(item, dict):
-                            # some SDKs: item["content"][0]["text"]
-                            content = item.get("content") or item.get("text")
-                            if isinstance(content, list):
-                                for c in content:
-                                    if isinstance(c, dict) and "text" in c:
-                                        parts.append(c["text"])
-                                    elif isinstance(c, str):
-                                        parts.append(c)
-                            elif isinstance(content, str):
-                                parts.append(content)
-                    mapping_text = "\n".join(parts).strip()
-                else:
-                    mapping_text = str(resp)
-            except Exception:
-                mapping_text = str(resp)
+        resp = await client.responses.create(**build_gpt_request(unique_names))
+
+        mapping_text = resp.output_text
         print("🔹 GPT raw output preview (first 400 chars):")
         print(mapping_text[:400])
 
-        # 解析 JSON
-        cleaned = mapping_text
-        if cleaned.startswith("```"):
-            cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
-            cleaned = re.sub(r"\s*```$", "", cleaned)
-        mapping = json.loads(cleaned)
+        # JSON模式保证输出是一个JSON对象
+        mapping = json.loads(mapping_text)
         print("GPT mapping parsed successfully.")
     except Exception as e:
         print("🔸 GPT fallback: parsing failed or GPT error:", e)
         # 如果GPT失败 每个名字映射到自己
-        mapping = {name: [name] for name in unique_names}
+        return {name: [name] for name in unique_names}
+
+    save_cached_mapping(unique_names, mapping)
+    return mapping
+
 
+# ---------------- 构建网络 ----------------
+def build_network(sentences, sent_persons, unique_names, mapping):
+    """把名字变体映射到canonical 再构建共现网络"""
     # ---------------- 建立变体 -> canonical 映射（保证完整） ----------------
     variant_to_canon = {}
 
@@ -247,7 +337,7 @@ Rules:
         if not canon_clean:
             continue
         # 忽略含skip_words的canonical
-        if any(k in canon_clean.lower() for k in skip_words):
+        if SKIP_RE.search(canon_clean):
             continue
         # 把canonical映射到自己 保证canonical出现在mapping
         variant_to_canon[canon_clean] = canon_clean
@@ -255,13 +345,12 @@ Rules:
         if isinstance(variants, list):
             for v in variants:
                 v_clean = clean_name(v)
-                if v_clean and not any(k in v_clean.lower() for k in skip_words):
+                if v_clean and not SKIP_RE.search(v_clean):
                     variant_to_canon[v_clean] = canon_clean
     
     # 只从现有的名字中提取部分匹配 不创建新名字 
     def enhance_mapping(variant_to_canon, all_extracted_names):
         enhanced_mapping = variant_to_canon.copy()
-        canonicals = list(set(enhanced_mapping.values()))
         all_names_set = set(all_extracted_names)  # 所有实际提取到的名字
     
         # 为每个已存在的名字变体 检查其部分是否也在提取的名字列表中
@@ -275,7 +364,7 @@ Rules:
                 if (len(part) > 2 and  # 避免太短的匹配
                     part in all_names_set and  
                     part not in enhanced_mapping and
-                    not any(k in part.lower() for k in skip_words)):
+                    not SKIP_RE.search(part)):
                     # 将这个部分映射到同一个 canonical
                     enhanced_mapping[part] = enhanced_mapping[existing_variant]
     
@@ -283,14 +372,17 @@ Rules:
 
     variant_to_canon = enhance_mapping(variant_to_canon, unique_names)
 
-    # 对unique_names中任何未被GPT映射的名字做identity映射
-    for n in unique_names:
-        n_clean = clean_name(n)
-        if not n_clean:
-            continue
+    # 倒排索引 词 -> 含有这个词的canonical 避免每个名字都遍历全部canonical
+    token_index = defaultdict(set)
+    for canon in set(variant_to_canon.values()):
+        for tok in canon.split():
+            token_index[tok].add(canon)
 
+    # 对unique_names中任何未被GPT映射的名字做identity映射
+    # unique_names里已经是clean_name的结果 不用再清洗
+    for n_clean in unique_names:
         # 如果尾部是s尝试去掉再匹配
-        if n_clean.lower().endswith("s"):
+        if n_clean.endswith(("s", "S")):
             singular = n_clean[:-1]
             if singular in variant_to_canon:
                 variant_to_canon[n_clean] = variant_to_canon[singular]
@@ -301,77 +393,61 @@ Rules:
             continue
         
         # 检查是否应该映射到现有的 canonical
-        matched = False
-        for canon in set(variant_to_canon.values()):
-            # 检查n_clean是否是canon的一部分 或者canon是n_clean的一部分
-            if (n_clean in canon.split() or canon in n_clean.split() or
-                n_clean == canon):
-                variant_to_canon[n_clean] = canon
-                matched = True
-                break
-    
+        # n_clean是canon的一部分 或者canon是n_clean的一部分
+        tokens = n_clean.split()
+        candidates = set(token_index.get(n_clean, ())) if len(tokens) == 1 else set()
+        candidates.update(t for t in tokens if t in token_index.get(t, ()))
+        if candidates:
+            # 多个候选时取词数最少的 保证结果稳定
+            variant_to_canon[n_clean] = min(candidates, key=lambda c: (len(c.split()), c))
+            continue
+
         # 如果没有匹配到任何现有的 做identity映射
-        if not matched and not any(k in n_clean.lower() for k in skip_words):
+        if not SKIP_RE.search(n_clean):
             variant_to_canon[n_clean] = n_clean
+            for tok in tokens:
+                token_index[tok].add(n_clean)
 
     
     # ---------------- 用 canonical 名称构建共现网络 ----------------
     def build_cooccurrence_network(sentences, sent_persons, variant_to_canon):
-        G = nx.Graph()
-        cooccurrence_texts = defaultdict(list)
+        # 用Counter计数 不逐条调用networkx的加点加边接口
+        node_count = Counter()
+        edge_count = Counter()
+        cooccurrence_texts = {}
 
         for sent, persons in zip(sentences, sent_persons):
             # 将句子中提取的每个名字替换成canonical 若没有canonical则跳过
-            canon_list = []
-            for p in persons:
-                p_clean = clean_name(p)
-                if not p_clean:
-                    continue
-                canon_name = variant_to_canon.get(p_clean)
-                if canon_name:
-                    canon_list.append(canon_name)
-            canon_list = list(set(canon_list))  # 去重
-
-            if not canon_list:
+            # persons在提取时已经过clean_name 直接收集成集合去重
+            canon_set = {variant_to_canon[p] for p in persons if p in variant_to_canon}
+            if not canon_set:
                 continue
 
             # 增加节点计数 使用canonical name
-            for a in canon_list:
-                if a in G.nodes:
-                    G.nodes[a]["count"] += 1
-                else:
-                    G.add_node(a, count=1)
-            # 增加边并保存上下文句子
-            for i in range(len(canon_list)):
-                for j in range(i + 1, len(canon_list)):
-                    a, b = canon_list[i], canon_list[j]
-                    if G.has_edge(a, b):
-                        G[a][b]["weight"] += 1
-                    else:
-                        G.add_edge(a, b, weight=1)
-                    # use sorted key so "A|B" and "B|A" map same
-                    key = "|".join(sorted([a, b]))
-                    if len(cooccurrence_texts[key]) < 5:  # 限制上下文条数 
-                        ###这里是否需要区分长文本和短文本 对于短文本如果是过长的上下文 导致不同人物被聚合到一起
-                        cooccurrence_texts[key].append(sent[:400])
-
-        nodes_to_keep = [n for n in G.nodes if G.nodes[n].get("count", 0) >= 5]
-    
-        # 创建子图 只保留出现次数>=5的节点
-        G_filtered = G.subgraph(nodes_to_keep).copy()
-    
-        all_nodes = list(G_filtered.nodes)
-        node_set = set(all_nodes)
-
+            node_count.update(canon_set)
+            # 增加边并保存上下文句子 排序后a<b "A|B" 和 "B|A" 不会同时出现
+            for a, b in combinations(sorted(canon_set), 2):
+                edge_count[(a, b)] += 1
+                key = f"{a}|{b}"
+                bucket = cooccurrence_texts.get(key)
+                if bucket is None:
+                    cooccurrence_texts[key] = [sent[:400]]
+                elif len(bucket) < 5:  # 限制上下文条数 满了就不再切片
+                    ###这里是否需要区分长文本和短文本 对于短文本如果是过长的上下文 导致不同人物被聚合到一起
+                    bucket.append(sent[:400])
+
+        # 只保留出现次数>=5的节点
+        node_set = {n for n, c in node_count.items() if c >= 5}
 
         # links：只保留两端都在node_set的边
-        links = []
-        for u, v, data in G.edges(data=True):
-            if u in node_set and v in node_set and data.get("weight", 0) > 0:
-                links.append({"source": u, "target": v, "value": int(data["weight"])})
+        links = [
+            {"source": a, "target": b, "value": w}
+            for (a, b), w in edge_count.items()
+            if a in node_set and b in node_set
+        ]
 
         # nodes：输出所有在node_set中的节点 按count排序（大到小）
-        nodes = [{"id": n, "value": int(G.nodes[n].get("count", 1))} for n in all_nodes]
+        nodes = [{"id": n, "value": c} for n, c in node_count.items() if n in node_set]
         nodes = sorted(nodes, key=lambda x: x["value"], reverse=True)
 
         print(f"Final Network: {len(nodes)} nodes, {len(links)} edges.")
@@ -382,11 +458,25 @@ Rules:
             if len(chars) == 2 and chars[0] in node_set and chars[1] in node_set:
                 filtered_contexts[key] = contexts
 
-        return {"nodes": nodes, "links": links, "contexts": dict(cooccurrence_texts)}
+        return {"nodes": nodes, "links": links, "contexts": filtered_contexts}
     
     result = build_cooccurrence_network(sentences, sent_persons, variant_to_canon)
     return result
 
+
+# ---------------- 主分析接口 ----------------
+@app.post("/analyze")
+async def analyze(file: UploadFile):
+    text = await read_upload_text(file)
+    # CPU密集的部分放到线程里 GPT调用直接await 都不阻塞事件循环
+    sentences, sent_persons, unique_names = await asyncio.to_thread(extract_candidates, text)
+    if is_small_input(text, unique_names):
+        print("🔹 Small input, skipping GPT normalization.")
+        mapping = {name: [name] for name in unique_names}
+    else:
+        mapping = await normalize_names(unique_names)
+    return await asyncio.to_thread(build_network, sentences, sent_persons, unique_names, mapping)
+
 @app.get("/ping")
 async def ping():
     return {"message": "pong", "key_loaded": bool(os.getenv("OPENAI_API_KEY"))}
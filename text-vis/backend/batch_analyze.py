@@ -0,0 +1,142 @@
+"""
+离线批量分析：多本小说的GPT名字聚合通过 OpenAI Batch API 一次提交
+费用约为在线接口的一半 但最长可能要等24小时 适合整批书目 不适合前端交互
+
+用法（在backend目录下）：
+    python batch_analyze.py book1.txt book2.txt --out results
+"""
+import os, json, time, argparse, tempfile
+from pathlib import Path
+from openai import OpenAI
+
+from app import (extract_candidates, build_gpt_request, build_network,
+                 load_cached_mapping, save_cached_mapping, is_small_input)
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# 轮询batch状态的间隔（秒）
+POLL_SECONDS = 30
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_file(jobs, path):
+    """每本书一行 /v1/responses 请求 custom_id用书名"""
+    with open(path, "w", encoding="utf-8") as f:
+        for book_id, (_, _, unique_names) in jobs.items():
+            line = {
+                "custom_id": book_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": build_gpt_request(unique_names),
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def output_text(body):
+    """从responses的原始JSON里拼出模型输出的文字"""
+    parts = []
+    for item in body.get("output", []):
+        for c in item.get("content") or []:
+            if c.get("type") == "output_text":
+                parts.append(c.get("text", ""))
+    return "\n".join(parts)
+
+
+def run_batch(jobs):
+    """上传请求文件 创建batch并等待完成 返回 custom_id -> mapping"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "requests.jsonl"
+        write_batch_file(jobs, path)
+        with open(path, "rb") as f:
+            batch_file = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    print(f"🔹 Batch {batch.id} submitted with {len(jobs)} books.")
+
+    while batch.status not in FINAL_STATUSES:
+        time.sleep(POLL_SECONDS)
+        batch = client.batches.retrieve(batch.id)
+        print(f"   status: {batch.status}")
+
+    # expired/cancelled的batch仍会给出已完成请求的output_file_id
+    # 只要有输出文件就读 缺少结果的书在main里退回identity映射
+    mappings = {}
+    if batch.status != "completed":
+        print(f"🔸 Batch ended with status {batch.status}, using whatever results it produced.")
+    if not batch.output_file_id:
+        print("🔸 No output file, falling back to identity mapping.")
+        return mappings
+
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            print(f"🔸 {record['custom_id']}: request failed:", record.get("error"))
+            continue
+        try:
+            mappings[record["custom_id"]] = json.loads(output_text(response["body"]))
+        except Exception as e:
+            print(f"🔸 {record['custom_id']}: parsing failed:", e)
+
+    missing = sorted(set(jobs) - set(mappings))
+    if missing:
+        print(f"🔸 No GPT mapping for {len(missing)} books, using identity mapping:", ", ".join(missing))
+    return mappings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze several novels with the OpenAI Batch API.")
+    parser.add_argument("books", nargs="+", type=Path, help="plain-text novels")
+    parser.add_argument("--out", type=Path, default=Path("results"), help="output directory")
+    args = parser.parse_args()
+
+    # 书名同时用作custom_id和输出文件名 重名会互相覆盖
+    stems = [path.stem for path in args.books]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        parser.error(f"duplicate book names (file name without extension): {', '.join(duplicates)}")
+
+    # 先在本地完成切句和人名提取
+    jobs, small_books = {}, set()
+    for path in args.books:
+        print(f"🔹 Extracting names from {path.name}...")
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        jobs[path.stem] = extract_candidates(text)
+        if is_small_input(text, jobs[path.stem][2]):
+            small_books.add(path.stem)
+
+    # 短文本和已缓存的书不再提交
+    mappings = {}
+    for book_id, (_, _, unique_names) in jobs.items():
+        if book_id in small_books:
+            mappings[book_id] = {name: [name] for name in unique_names}
+            continue
+        cached = load_cached_mapping(unique_names)
+        if cached is not None:
+            mappings[book_id] = cached
+    pending = {k: v for k, v in jobs.items() if k not in mappings}
+    if pending:
+        fresh = run_batch(pending)
+        for book_id, mapping in fresh.items():
+            save_cached_mapping(pending[book_id][2], mapping)
+        mappings.update(fresh)
+
+    # 把每本书的mapping合并回去 构建网络
+    args.out.mkdir(parents=True, exist_ok=True)
+    for book_id, (sentences, sent_persons, unique_names) in jobs.items():
+        # 没拿到GPT结果的书 每个名字映射到自己
+        mapping = mappings.get(book_id) or {name: [name] for name in unique_names}
+        result = build_network(sentences, sent_persons, unique_names, mapping)
+        out_path = args.out / f"{book_id}.json"
+        out_path.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+        print(f"✅ {book_id}: {out_path}")
+
+
+if __name__ == "__main__":
+    main()